@@ -0,0 +1,94 @@
+"""Detecção de anomalias nas rotas origem-destino
+
+Todas as funções recebem a matriz rotas x meses (ver `build_matriz_rotas` em app.py)
+como array NumPy e pontuam todas as rotas de uma vez, sem laços por rota.
+"""
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Fator que torna a MAD comparável ao desvio padrão em dados normais
+FATOR_MAD = 1.4826
+
+# Piso da escala: ruído de contagem (raiz do volume típico da rota, como em Poisson),
+# nunca abaixo de 1 embarque. Evita z-scores enormes em rotas constantes ou esparsas.
+ESCALA_MINIMA = 1.0
+
+# Volume mínimo padrão (embarques no mês, real ou esperado) para uma rota entrar no
+# ranking: abaixo disso as variações são dominadas por ruído de rotas esparsas
+VOLUME_MINIMO_PADRAO = 20
+
+
+def piso_escala(nivel):
+    """Escala mínima para um nível de volume: raiz do volume, com piso de ESCALA_MINIMA"""
+    return np.maximum(np.sqrt(np.maximum(nivel, 0)), ESCALA_MINIMA)
+
+
+def zscores_moveis(valores, janela=6):
+    """Z-score robusto de cada mês contra a mediana/MAD dos `janela` meses anteriores
+
+    Retorna (z, esperado); meses sem histórico suficiente ficam como NaN.
+    """
+    n_rotas, n_meses = valores.shape
+    z = np.full((n_rotas, n_meses), np.nan)
+    esperado = np.full((n_rotas, n_meses), np.nan)
+    if n_meses <= janela:
+        return z, esperado
+
+    # Janelas terminando no mês anterior a cada mês pontuado
+    historico = sliding_window_view(valores, janela, axis=1)[:, :-1, :]
+    mediana = np.median(historico, axis=2)
+    mad = np.median(np.abs(historico - mediana[:, :, None]), axis=2)
+    escala = np.maximum(FATOR_MAD * mad, piso_escala(mediana))
+
+    z[:, janela:] = (valores[:, janela:] - mediana) / escala
+    esperado[:, janela:] = mediana
+    return z, esperado
+
+
+def zscores_sazonais(valores, periodo=12):
+    """Z-score robusto da variação contra o mesmo mês do ano anterior
+
+    A linha de base é o valor de `periodo` meses antes, corrigido pela variação
+    sazonal típica da rota; a escala é a MAD dessas variações ao longo da série.
+    """
+    n_rotas, n_meses = valores.shape
+    z = np.full((n_rotas, n_meses), np.nan)
+    esperado = np.full((n_rotas, n_meses), np.nan)
+    if n_meses <= periodo:
+        return z, esperado
+
+    diferencas = valores[:, periodo:] - valores[:, :-periodo]
+    mediana = np.median(diferencas, axis=1, keepdims=True)
+    mad = np.median(np.abs(diferencas - mediana), axis=1, keepdims=True)
+    # Diferença de duas contagens: variância de ruído ~ 2x o volume típico da rota
+    nivel = np.median(valores, axis=1, keepdims=True)
+    escala = np.maximum(FATOR_MAD * mad, piso_escala(2 * nivel))
+
+    z[:, periodo:] = (diferencas - mediana) / escala
+    esperado[:, periodo:] = valores[:, :-periodo] + mediana
+    return z, esperado
+
+
+def calcular_scores(valores, janela=6, periodo=12):
+    """Pontua todas as rotas em todos os meses
+
+    Onde há linha de base sazonal, o score é o z-score de menor magnitude entre o
+    móvel e o sazonal (a rota precisa destoar de ambos, o que descarta picos que
+    apenas repetem a sazonalidade). Sem histórico sazonal, vale o z-score móvel.
+    Retorna um dicionário de matrizes rotas x meses.
+    """
+    valores = np.asarray(valores, dtype=float)
+    z_movel, esperado_movel = zscores_moveis(valores, janela)
+    z_sazonal, esperado_sazonal = zscores_sazonais(valores, periodo)
+
+    tem_sazonal = ~np.isnan(z_sazonal)
+    usar_sazonal = tem_sazonal & (np.abs(z_sazonal) < np.abs(z_movel))
+    score = np.where(usar_sazonal, z_sazonal, z_movel)
+    esperado = np.where(usar_sazonal, esperado_sazonal, esperado_movel)
+
+    return {
+        'score': score,
+        'esperado': esperado,
+        'z_movel': z_movel,
+        'z_sazonal': z_sazonal
+    }
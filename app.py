@@ -1,4 +1,4 @@
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, render_template, request, jsonify, send_file, Response
 import pandas as pd
 import numpy as np
 import json
@@ -6,16 +6,38 @@ import io
 from datetime import datetime
 import os
 from werkzeug.utils import secure_filename
+from collections import OrderedDict
+import multiprocessing
+import anomalias
+import consultas
+import geometria
+import previsao
 
 app = Flask(__name__)
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 app.config['UPLOAD_FOLDER'] = 'uploads'
 
-# Criar pasta de uploads se não existir
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-
 # Dados globais em memória
 global_data = None
+versao_dados = 0  # incrementada a cada upload; chave dos caches derivados dos dados
+cache_anomalias = {'versao': None, 'resultado': None}
+cache_previsoes = {'versao': None, 'series': None, 'meses': None, 'valores': None, 'lotes': None, 'resultado': None}
+
+# Previsões: horizonte máximo calculado no upload e pool de processos para o ajuste em lote.
+# Um processo por padrão (o ajuste sai do caminho da requisição sem pesar em planos pequenos);
+# o pool é encerrado assim que as previsões de uma versão são coletadas
+HORIZONTE_PREVISAO = 12
+PREVISAO_WORKERS = int(os.environ.get('PREVISAO_WORKERS', 1))
+executor_previsao = None
+
+# Mapa de fluxos: coordenadas (já espalhadas) por versão dos dados e respostas por conjunto de filtros
+cache_coordenadas = {'versao': None, 'coords': None}
+cache_fluxos_mapa = OrderedDict()
+MAX_CACHE_FLUXOS_MAPA = 64
+
+# Consultas ad hoc: conexão DuckDB registrada sobre a versão atual dos dados
+cache_consultas = {'versao': None, 'conexao': None}
+
 mesorregioes_info = {
     'Norte': ['Acre', 'Amazonas', 'Rondônia', 'Roraima', 'Amapá', 'Pará', 'Tocantins'],
     'Nordeste': ['Maranhão', 'Piauí', 'Ceará', 'Rio Grande do Norte', 'Pernambuco', 'Paraíba', 'Sergipe', 'Alagoas', 'Bahia'],
@@ -97,6 +119,55 @@ def get_filtered_data(filters):
     
     return df
 
+def build_matriz_rotas(df):
+    """Monta a matriz rotas (origem, destino) x meses com a soma de embarques"""
+    matriz = df.groupby(['MESORREGIÃO - ORIGEM', 'MESORREGIÃO - DESTINO', 'DATA'])['EMBARQUES'].sum()
+    matriz = matriz.unstack('DATA', fill_value=0)
+
+    # Garantir eixo mensal contínuo (meses sem embarques entram como zero)
+    meses = pd.date_range(matriz.columns.min(), matriz.columns.max(), freq='MS')
+    return matriz.reindex(columns=meses, fill_value=0).astype(float)
+
+def parse_periodos(valores):
+    """Converte parâmetros 'inicio..fim' em uma lista de janelas (inicio, fim)
+
+    O separador '..' não aparece em datas, então início e fim podem ter horário
+    (ex.: 2022-01-01T00:00..2022-02).
+    """
+    periodos = []
+    for valor in valores:
+        partes = valor.split('..')
+        if len(partes) != 2:
+            return None, f"Período inválido: {valor} (use inicio..fim)"
+        try:
+            inicio = pd.to_datetime(partes[0])
+            fim = pd.to_datetime(partes[1])
+        except (ValueError, TypeError):
+            return None, f"Período inválido: {valor}"
+        if inicio > fim:
+            return None, f"Período inválido: {valor} (início posterior ao fim)"
+        periodos.append((inicio, fim))
+    return periodos, None
+
+def calcular_variacoes(valores):
+    """Calcula deltas, variações percentuais e rankings de cada janela em relação à primeira
+
+    `valores` é uma matriz itens x janelas; todas as janelas são processadas de uma vez.
+    """
+    base = valores[:, [0]]
+    delta = valores - base
+    with np.errstate(divide='ignore', invalid='ignore'):
+        percentual = np.where(base > 0, delta / base * 100, np.nan)
+
+    ranking = pd.DataFrame(valores).rank(axis=0, method='min', ascending=False).to_numpy()
+    variacao_ranking = ranking[:, [0]] - ranking  # positivo = subiu no ranking
+
+    return delta, percentual, ranking, variacao_ranking
+
+def valores_para_lista(valores, casas=1):
+    """Converte uma linha numérica em lista JSON (NaN vira None)"""
+    return [None if np.isnan(v) else round(float(v), casas) for v in valores]
+
 @app.route('/')
 def index():
     """Página inicial do dashboard"""
@@ -125,7 +196,7 @@ def balanco():
 @app.route('/api/upload', methods=['POST'])
 def upload_file():
     """API para upload de arquivo Excel"""
-    global global_data
+    global global_data, versao_dados
     
     if 'file' not in request.files:
         return jsonify({'success': False, 'error': 'Nenhum arquivo enviado'})
@@ -137,6 +208,9 @@ def upload_file():
     if file and file.filename.endswith(('.xlsx', '.xls')):
         filename = secure_filename(file.filename)
         filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+        
+        # Criar pasta de uploads se não existir (só quando há upload, não no import)
+        os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
         file.save(filepath)
         
         # Processar dados
@@ -145,6 +219,8 @@ def upload_file():
             return jsonify({'success': False, 'error': error})
         
         global_data = df
+        versao_dados += 1
+        iniciar_previsoes()
         
         # Remover arquivo temporário
         os.remove(filepath)
@@ -309,13 +385,45 @@ def get_heatmap_data():
         'valores': heatmap_matrix.values.tolist()
     })
 
+def get_coordenadas_regioes():
+    """Retorna as coordenadas de todas as mesorregiões, calculadas uma vez por versão dos dados
+
+    Regiões que resolvem para o mesmo ponto (ex.: capital do estado) são espalhadas
+    em círculo para que seus fluxos não se sobreponham.
+    """
+    if cache_coordenadas['versao'] != versao_dados:
+        regioes = pd.unique(pd.concat([global_data['MESORREGIÃO - ORIGEM'], global_data['MESORREGIÃO - DESTINO']]))
+        regioes = sorted(regioes)
+        coords = geometria.espalhar_coincidentes([get_coordinates(regiao) for regiao in regioes])
+        cache_coordenadas['coords'] = dict(zip(regioes, coords))
+        cache_coordenadas['versao'] = versao_dados
+    return cache_coordenadas['coords']
+
 @app.route('/api/fluxos_mapa')
 def get_fluxos_mapa():
-    """API para dados de fluxos para o mapa"""
+    """API para dados de fluxos para o mapa
+
+    A geometria de cada fluxo (arco de grande círculo com empacotamento por corredor)
+    é gerada no servidor e enviada como polyline codificada, com número de pontos e
+    precisão conforme o `zoom`. A resposta é guardada por versão dos dados e filtros.
+    """
     if global_data is None:
         return jsonify({'error': 'Nenhum dado carregado'})
     
     filters = request.args.to_dict()
+    
+    zoom = filters.pop('zoom', 5)
+    try:
+        zoom = int(float(zoom))
+    except (ValueError, TypeError, OverflowError):
+        zoom = 5
+    nivel, n_pontos, casas, celula = geometria.nivel_zoom(zoom)
+    
+    chave = (versao_dados, nivel, tuple(sorted(filters.items())))
+    if chave in cache_fluxos_mapa:
+        cache_fluxos_mapa.move_to_end(chave)
+        return app.response_class(cache_fluxos_mapa[chave], mimetype='application/json')
+    
     df = get_filtered_data(filters)
     
     if df.empty:
@@ -342,13 +450,28 @@ def get_fluxos_mapa():
         except:
             pass  # Ignorar filtro de top_n inválido
     
-    # Adicionar coordenadas simuladas (em produção, usar shapefiles reais)
-    fluxos['origem_coords'] = fluxos['MESORREGIÃO - ORIGEM'].apply(lambda x: get_coordinates(x))
-    fluxos['destino_coords'] = fluxos['MESORREGIÃO - DESTINO'].apply(lambda x: get_coordinates(x))
+    if fluxos.empty:
+        return jsonify({'fluxos': [], 'precisao': casas})
     
-    return jsonify({
-        'fluxos': fluxos.to_dict('records')
+    # Coordenadas reais ainda não disponíveis (em produção, usar shapefiles reais)
+    coordenadas = get_coordenadas_regioes()
+    origens = np.array([coordenadas[regiao] for regiao in fluxos['MESORREGIÃO - ORIGEM']])
+    destinos = np.array([coordenadas[regiao] for regiao in fluxos['MESORREGIÃO - DESTINO']])
+    
+    linhas = geometria.empacotar(origens, destinos, fluxos['EMBARQUES'].to_numpy(), n_pontos, celula)
+    fluxos['origem_coords'] = np.round(origens, casas).tolist()
+    fluxos['destino_coords'] = np.round(destinos, casas).tolist()
+    fluxos['geometria'] = geometria.codificar_polylines(linhas, casas)
+    
+    corpo = json.dumps({
+        'fluxos': fluxos.to_dict('records'),
+        'precisao': casas
     })
+    cache_fluxos_mapa[chave] = corpo
+    if len(cache_fluxos_mapa) > MAX_CACHE_FLUXOS_MAPA:
+        cache_fluxos_mapa.popitem(last=False)
+    
+    return app.response_class(corpo, mimetype='application/json')
 
 @app.route('/api/tabela_dados')
 def get_tabela_dados():
@@ -460,6 +583,391 @@ def get_balanco_embarques():
     except Exception as e:
         return jsonify({'error': str(e)})
 
+@app.route('/api/comparacao')
+def get_comparacao():
+    """API para comparação entre períodos (totais, regiões e pares origem-destino)
+
+    Recebe duas ou mais janelas em `periodo=inicio..fim` (a primeira é a base) e
+    calcula tudo em uma única passagem sobre o eixo mensal da matriz de rotas.
+    """
+    if global_data is None:
+        return jsonify({'error': 'Nenhum dado carregado'})
+
+    filters = request.args.to_dict()
+
+    periodos, error = parse_periodos(request.args.getlist('periodo'))
+    if error:
+        return jsonify({'error': error})
+    if len(periodos) < 2:
+        return jsonify({'error': 'Informe ao menos dois períodos (periodo=inicio..fim)'})
+
+    # Filtros de mesorregião; sem eles a base é usada diretamente, sem cópia
+    df = global_data
+    if filters.get('origens') or filters.get('destinos'):
+        mascara = pd.Series(True, index=global_data.index)
+        if filters.get('origens'):
+            mascara &= global_data['MESORREGIÃO - ORIGEM'].isin([filters['origens']])
+        if filters.get('destinos'):
+            mascara &= global_data['MESORREGIÃO - DESTINO'].isin([filters['destinos']])
+        df = global_data[mascara]
+
+    if df.empty:
+        return jsonify({'error': 'Nenhum dado encontrado com os filtros aplicados'})
+
+    try:
+        limiar = float(filters.get('limiar', 10))
+    except (ValueError, TypeError):
+        limiar = 10.0
+
+    try:
+        delta_min = float(filters.get('delta_min', 0))
+    except (ValueError, TypeError):
+        delta_min = 0.0
+
+    limit = filters.get('limit', 50)
+    try:
+        limit = int(limit)
+    except (ValueError, TypeError):
+        limit = 50
+
+    # Matriz rotas x meses e matriz meses x janelas: os totais de todas as janelas saem de um produto
+    matriz = build_matriz_rotas(df)
+    meses = matriz.columns.values
+    janelas = np.column_stack([(meses >= inicio) & (meses <= fim) for inicio, fim in periodos])
+    totais_rotas = pd.DataFrame(matriz.to_numpy() @ janelas, index=matriz.index)
+
+    def montar_itens(totais, chaves):
+        valores = totais.to_numpy()
+        delta, percentual, ranking, variacao_ranking = calcular_variacoes(valores)
+
+        # Rotas/regiões que surgem do zero contam como variação acima do limiar
+        comparadas = slice(1, None)
+        excede_pct = (np.abs(percentual[:, comparadas]) >= limiar) | ((valores[:, [0]] == 0) & (delta[:, comparadas] != 0))
+        excede = (excede_pct & (np.abs(delta[:, comparadas]) >= delta_min)).any(axis=1)
+
+        ordem = np.argsort(-np.abs(delta[:, comparadas]).max(axis=1), kind='stable')
+        ordem = ordem[excede[ordem]]
+        if limit > 0:
+            ordem = ordem[:limit]
+
+        itens = []
+        for i in ordem:
+            chave = totais.index[i]
+            item = dict(zip(chaves, chave if isinstance(chave, tuple) else (chave,)))
+            item.update({
+                'embarques': valores[i].astype(int).tolist(),
+                'delta': delta[i].astype(int).tolist(),
+                'percentual': valores_para_lista(percentual[i]),
+                'ranking': ranking[i].astype(int).tolist(),
+                'variacao_ranking': variacao_ranking[i].astype(int).tolist()
+            })
+            itens.append(item)
+        return itens, int(excede.sum())
+
+    pares, total_pares = montar_itens(totais_rotas, ['origem', 'destino'])
+    origens, _ = montar_itens(totais_rotas.groupby(level=0).sum(), ['regiao'])
+    destinos, _ = montar_itens(totais_rotas.groupby(level=1).sum(), ['regiao'])
+
+    totais = totais_rotas.sum(axis=0).to_numpy()
+    delta_totais = totais - totais[0]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        percentual_totais = np.where(totais[0] > 0, delta_totais / totais[0] * 100, np.nan)
+
+    return jsonify({
+        'periodos': [{'inicio': inicio.strftime('%m/%Y'), 'fim': fim.strftime('%m/%Y')} for inicio, fim in periodos],
+        'totais': {
+            'embarques': totais.astype(int).tolist(),
+            'delta': delta_totais.astype(int).tolist(),
+            'percentual': valores_para_lista(percentual_totais)
+        },
+        'origens': origens,
+        'destinos': destinos,
+        'pares': pares,
+        'total_pares_acima_limiar': total_pares,
+        'limiar': limiar
+    })
+
+def get_scores_anomalias():
+    """Retorna os scores de anomalia de todas as rotas, calculados uma vez por versão dos dados"""
+    if cache_anomalias['versao'] != versao_dados:
+        matriz = build_matriz_rotas(global_data)
+        resultado = anomalias.calcular_scores(matriz.to_numpy())
+        resultado['valores'] = matriz.to_numpy()
+        resultado['origens'] = matriz.index.get_level_values(0).to_numpy()
+        resultado['destinos'] = matriz.index.get_level_values(1).to_numpy()
+        resultado['meses'] = matriz.columns
+        cache_anomalias['resultado'] = resultado
+        cache_anomalias['versao'] = versao_dados
+    return cache_anomalias['resultado']
+
+@app.route('/api/anomalias')
+def get_anomalias():
+    """API para ranking das rotas origem-destino mais anômalas em um mês
+
+    Por padrão só entram rotas com pelo menos anomalias.VOLUME_MINIMO_PADRAO embarques
+    no mês (real ou esperado); `volume_min=0` inclui as rotas esparsas.
+    """
+    if global_data is None:
+        return jsonify({'error': 'Nenhum dado carregado'})
+
+    filters = request.args.to_dict()
+    scores = get_scores_anomalias()
+    meses = scores['meses']
+
+    # Mês de referência (padrão: último mês da base)
+    coluna = len(meses) - 1
+    if filters.get('mes'):
+        try:
+            coluna = meses.get_loc(pd.to_datetime(filters['mes']).to_period('M').to_timestamp())
+        except (KeyError, ValueError, TypeError):
+            return jsonify({'error': f"Mês fora do período dos dados: {filters['mes']}"})
+
+    try:
+        limiar = float(filters.get('limiar', 3.5))
+    except (ValueError, TypeError):
+        limiar = 3.5
+
+    try:
+        volume_min = float(filters.get('volume_min', anomalias.VOLUME_MINIMO_PADRAO))
+    except (ValueError, TypeError):
+        volume_min = float(anomalias.VOLUME_MINIMO_PADRAO)
+
+    top_k = filters.get('top_k', 50)
+    try:
+        top_k = int(top_k)
+    except (ValueError, TypeError):
+        top_k = 50
+
+    score = scores['score'][:, coluna]
+    esperado = scores['esperado'][:, coluna]
+    valores = scores['valores'][:, coluna]
+
+    mascara = np.abs(np.nan_to_num(score)) >= limiar
+    if volume_min > 0:
+        mascara &= np.maximum(valores, np.nan_to_num(esperado)) >= volume_min
+
+    tipo = filters.get('tipo', '')
+    if tipo == 'queda':
+        mascara &= score < 0
+    elif tipo == 'pico':
+        mascara &= score > 0
+
+    if filters.get('origens'):
+        mascara &= scores['origens'] == filters['origens']
+    if filters.get('destinos'):
+        mascara &= scores['destinos'] == filters['destinos']
+
+    indices = np.flatnonzero(mascara)
+    indices = indices[np.argsort(-np.abs(score[indices]), kind='stable')]
+    if top_k > 0:
+        indices = indices[:top_k]
+
+    rotas = [{
+        'origem': scores['origens'][i],
+        'destino': scores['destinos'][i],
+        'embarques': int(valores[i]),
+        'esperado': round(float(esperado[i]), 1),
+        'score': round(float(score[i]), 2),
+        'tipo': 'pico' if score[i] > 0 else 'queda'
+    } for i in indices]
+
+    return jsonify({
+        'mes': meses[coluna].strftime('%m/%Y'),
+        'rotas': rotas,
+        'total_anomalias': int(mascara.sum()),
+        'total_rotas': len(score),
+        'limiar': limiar
+    })
+
+def build_series_previsao(df):
+    """Empilha as séries mensais a prever: total, por origem, por destino e por rota
+
+    O índice das linhas é (tipo, origem, destino), com '' nos níveis que não se aplicam.
+    """
+    rotas = build_matriz_rotas(df)
+    por_origem = rotas.groupby(level=0).sum()
+    por_destino = rotas.groupby(level=1).sum()
+    total = rotas.sum(axis=0).to_frame().T
+
+    total.index = pd.MultiIndex.from_tuples([('total', '', '')])
+    por_origem.index = pd.MultiIndex.from_arrays([['origem'] * len(por_origem), por_origem.index, [''] * len(por_origem)])
+    por_destino.index = pd.MultiIndex.from_arrays([['destino'] * len(por_destino), [''] * len(por_destino), por_destino.index])
+    rotas.index = pd.MultiIndex.from_arrays([['rota'] * len(rotas), rotas.index.get_level_values(0), rotas.index.get_level_values(1)])
+
+    series = pd.concat([total, por_origem, por_destino, rotas])
+    series.index.names = ['tipo', 'origem', 'destino']
+    return series
+
+def get_executor_previsao():
+    """Cria (uma vez) o pool de processos usado no ajuste das previsões"""
+    global executor_previsao
+    if executor_previsao is None:
+        # Import tardio: o pool só é necessário no primeiro upload
+        from concurrent.futures import ProcessPoolExecutor
+        
+        # 'spawn' evita herdar locks de threads do servidor no fork
+        executor_previsao = ProcessPoolExecutor(max_workers=PREVISAO_WORKERS,
+                                                mp_context=multiprocessing.get_context('spawn'))
+    return executor_previsao
+
+def encerrar_executor_previsao():
+    """Encerra o pool de previsões (sem esperar), liberando os processos; o próximo uso cria outro"""
+    global executor_previsao
+    if executor_previsao is not None:
+        executor_previsao.shutdown(wait=False, cancel_futures=True)
+        executor_previsao = None
+
+def iniciar_previsoes(paralelo=True):
+    """Dispara o ajuste em lote das previsões para a versão atual dos dados
+
+    Com `paralelo=False` o ajuste é feito no próprio processo (usado no pré-carregamento,
+    antes do fork dos workers, quando não se deve criar um pool de processos).
+    """
+    series = build_series_previsao(global_data)
+    cache_previsoes.update({
+        'versao': versao_dados,
+        'series': series.index,
+        'meses': series.columns,
+        'valores': series.to_numpy(),
+        'lotes': None,
+        'resultado': None
+    })
+
+    if not paralelo:
+        cache_previsoes['resultado'] = previsao.ajustar_lote(cache_previsoes['valores'], HORIZONTE_PREVISAO)
+        return
+
+    try:
+        cache_previsoes['lotes'] = previsao.ajustar_em_paralelo(cache_previsoes['valores'], HORIZONTE_PREVISAO,
+                                                                get_executor_previsao(), PREVISAO_WORKERS)
+    except (OSError, RuntimeError, NotImplementedError):
+        # Sem suporte a processos no ambiente (ou pool quebrado): ajustar no próprio processo
+        encerrar_executor_previsao()
+        cache_previsoes['resultado'] = previsao.ajustar_lote(cache_previsoes['valores'], HORIZONTE_PREVISAO)
+
+def get_resultado_previsoes():
+    """Retorna as previsões da versão atual, aguardando o pool se ainda estiver ajustando"""
+    if cache_previsoes['versao'] != versao_dados:
+        iniciar_previsoes()
+    if cache_previsoes['resultado'] is None:
+        try:
+            resultado = previsao.juntar_resultados([lote.result() for lote in cache_previsoes['lotes']])
+        except Exception:
+            # Pool quebrado (ex.: processo morto por falta de memória): ajustar no próprio processo
+            resultado = previsao.ajustar_lote(cache_previsoes['valores'], HORIZONTE_PREVISAO)
+        encerrar_executor_previsao()
+        cache_previsoes['resultado'] = resultado
+        cache_previsoes['lotes'] = None
+    return cache_previsoes['resultado']
+
+@app.route('/api/previsao')
+def get_previsao():
+    """API para projeção dos próximos meses com intervalo de 95%
+
+    A série é escolhida pelos filtros: origem e destino (rota), só origem, só destino
+    ou, sem filtros, o total geral. `historico` traz a série observada no eixo mensal
+    contínuo da base (meses sem embarques como zero), do qual a previsão continua.
+    """
+    if global_data is None:
+        return jsonify({'error': 'Nenhum dado carregado'})
+
+    filters = request.args.to_dict()
+
+    horizonte = filters.get('horizonte', 6)
+    try:
+        horizonte = min(max(int(horizonte), 1), HORIZONTE_PREVISAO)
+    except (ValueError, TypeError):
+        horizonte = 6
+
+    origem = filters.get('origens', '')
+    destino = filters.get('destinos', '')
+    if origem and destino:
+        chave = ('rota', origem, destino)
+    elif origem:
+        chave = ('origem', origem, '')
+    elif destino:
+        chave = ('destino', '', destino)
+    else:
+        chave = ('total', '', '')
+
+    try:
+        resultado = get_resultado_previsoes()
+    except Exception as e:
+        return jsonify({'error': f"Erro ao calcular previsões: {str(e)}"})
+
+    try:
+        linha = cache_previsoes['series'].get_loc(chave)
+    except KeyError:
+        return jsonify({'error': 'Nenhum dado encontrado com os filtros aplicados'})
+
+    meses = cache_previsoes['meses']
+    meses_futuros = pd.date_range(meses[-1] + pd.DateOffset(months=1), periods=horizonte, freq='MS')
+
+    return jsonify({
+        'historico': {
+            'labels': [f"{mes.month}/{mes.year}" for mes in meses],
+            'embarques': cache_previsoes['valores'][linha].round().astype(int).tolist()
+        },
+        'labels': [f"{mes.month}/{mes.year}" for mes in meses_futuros],
+        'previsao': resultado['previsao'][linha, :horizonte].round().astype(int).tolist(),
+        'inferior': resultado['inferior'][linha, :horizonte].round().astype(int).tolist(),
+        'superior': resultado['superior'][linha, :horizonte].round().astype(int).tolist(),
+        'modelo': resultado['modelo'],
+        'nivel_confianca': 95
+    })
+
+def get_conexao_consultas():
+    """Retorna a conexão do motor de consultas, recriada quando a versão dos dados muda"""
+    if cache_consultas['versao'] != versao_dados:
+        if cache_consultas['conexao'] is not None:
+            cache_consultas['conexao'].close()
+        cache_consultas['conexao'] = consultas.criar_conexao(global_data)
+        cache_consultas['versao'] = versao_dados
+    return cache_consultas['conexao']
+
+@app.route('/api/consulta', methods=['POST'])
+def get_consulta():
+    """API para consultas agregadas ad hoc (somente leitura) sobre os embarques
+
+    Recebe uma especificação JSON, por exemplo:
+        {"dimensoes": ["origem", "destino", "mes"], "metricas": ["embarques"],
+         "filtros": [{"campo": "mes", "op": "in", "valor": ["2024-01", "2024-02"]},
+                     {"campo": "embarques", "op": ">", "valor": 500}],
+         "ordem": [{"campo": "embarques", "direcao": "desc"}], "limite": 100}
+    O resultado é enviado em lotes, em JSON ou em Arrow IPC (`"formato": "arrow"`).
+    """
+    if global_data is None:
+        return jsonify({'error': 'Nenhum dado carregado'})
+    
+    spec = request.get_json(silent=True)
+    try:
+        sql, parametros, timeout = consultas.montar_consulta(spec)
+    except ValueError as e:
+        return jsonify({'error': str(e)})
+    
+    formato = spec.get('formato', 'json')
+    if formato not in ('json', 'arrow'):
+        return jsonify({'error': "Formato não suportado (use 'json' ou 'arrow')"})
+    if formato == 'arrow':
+        try:
+            import pyarrow  # noqa: F401 (necessário para to_arrow_reader)
+        except ImportError:
+            return jsonify({'error': 'Formato arrow requer pyarrow instalado'})
+    
+    try:
+        conexao = get_conexao_consultas()
+    except ImportError:
+        return jsonify({'error': 'Motor de consultas (duckdb) não instalado'})
+    
+    try:
+        cursor, timer = consultas.executar(conexao, sql, parametros, timeout)
+    except Exception as e:
+        return jsonify({'error': f"Erro ao executar consulta: {str(e)}"})
+    
+    if formato == 'arrow':
+        return Response(consultas.gerar_arrow(cursor, timer), mimetype='application/vnd.apache.arrow.stream')
+    return Response(consultas.gerar_json(cursor, timer), mimetype='application/json')
+
 @app.route('/api/exportar_excel')
 def exportar_excel():
     """API para exportar dados em Excel"""
@@ -783,5 +1291,33 @@ def get_mesorregioes():
         'destinos': destinos
     })
 
+def carregar_dados_iniciais():
+    """Carrega o arquivo de DADOS_INICIAIS (se definido) e pré-calcula os caches derivados
+
+    Chamado no import: com `preload_app` do gunicorn (ver gunicorn.conf.py) isso roda uma
+    única vez no processo mestre e os workers compartilham os dados via copy-on-write.
+    """
+    global global_data, versao_dados
+    
+    caminho = os.environ.get('DADOS_INICIAIS')
+    if not caminho:
+        return
+    
+    df, error = process_excel_data(caminho)
+    if error:
+        app.logger.error(f"Falha ao carregar DADOS_INICIAIS ({caminho}): {error}")
+        return
+    
+    global_data = df
+    versao_dados += 1
+    get_coordenadas_regioes()
+    get_scores_anomalias()
+    iniciar_previsoes(paralelo=False)
+
+# Filhos do pool de previsões (contexto 'spawn') reimportam o script principal como
+# __mp_main__ quando o app roda com `python app.py`; eles não precisam dos dados
+if __name__ != '__mp_main__' and multiprocessing.parent_process() is None:
+    carregar_dados_iniciais()
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,83 @@
+"""Benchmark do tempo de inicialização (import do app)
+
+Mede, em processos novos, quanto tempo leva `import app` e verifica que bibliotecas
+pesadas que só são necessárias sob demanda (Excel, geoespaciais) não são importadas
+na inicialização. Sai com código 1 se o tempo mediano passar do limite, para ser
+usado como verificação contra regressões.
+
+Uso:
+    python benchmark_startup.py [--repeticoes 5] [--limite 2.0]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+# Módulos que não devem ser carregados no import do app
+IMPORTS_SOB_DEMANDA = ['openpyxl', 'geopandas', 'shapely', 'concurrent.futures.process', 'duckdb']
+
+SCRIPT_MEDICAO = """
+import json, sys, time
+sys.path.insert(0, {raiz!r})
+inicio = time.perf_counter()
+import app
+duracao = time.perf_counter() - inicio
+print(json.dumps({{'duracao': duracao, 'modulos': [m for m in {modulos!r} if m in sys.modules]}}))
+"""
+
+
+def medir_import(raiz):
+    """Executa `import app` em um processo novo e retorna (segundos, módulos sob demanda carregados)"""
+    script = SCRIPT_MEDICAO.format(raiz=raiz, modulos=IMPORTS_SOB_DEMANDA)
+    ambiente = dict(os.environ)
+    ambiente.pop('DADOS_INICIAIS', None)  # medir só a inicialização, sem carga de dados
+
+    # Diretório temporário: o import não deve criar arquivos/pastas no diretório atual
+    with tempfile.TemporaryDirectory() as diretorio:
+        saida = subprocess.run([sys.executable, '-c', script], cwd=diretorio, env=ambiente,
+                               capture_output=True, text=True, check=True)
+        criados = os.listdir(diretorio)
+
+    resultado = json.loads(saida.stdout.strip().splitlines()[-1])
+    return resultado['duracao'], resultado['modulos'], criados
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark do tempo de import do app')
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--limite', type=float, default=2.0, help='tempo mediano máximo em segundos')
+    args = parser.parse_args()
+
+    raiz = os.path.dirname(os.path.abspath(__file__))
+
+    # Primeira execução só aquece o cache de bytecode e do sistema de arquivos
+    medir_import(raiz)
+
+    duracoes = []
+    problemas = []
+    for _ in range(args.repeticoes):
+        duracao, modulos, criados = medir_import(raiz)
+        duracoes.append(duracao)
+        if modulos:
+            problemas.append(f"módulos sob demanda importados na inicialização: {', '.join(modulos)}")
+        if criados:
+            problemas.append(f"import criou arquivos/pastas: {', '.join(criados)}")
+
+    mediana = statistics.median(duracoes)
+    print(f"import app: mediana {mediana:.3f}s, mínimo {min(duracoes):.3f}s, máximo {max(duracoes):.3f}s "
+          f"({args.repeticoes} repetições)")
+
+    if mediana > args.limite:
+        problemas.append(f"tempo mediano {mediana:.3f}s acima do limite de {args.limite:.3f}s")
+
+    for problema in sorted(set(problemas)):
+        print(f"ERRO: {problema}")
+
+    return 1 if problemas else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,288 @@
+"""Consultas analíticas ad hoc sobre os embarques carregados (DuckDB em processo)
+
+A consulta não é SQL livre: o cliente envia uma especificação JSON (dimensões,
+métricas, filtros, ordenação) e o SQL é montado aqui a partir de listas fechadas de
+campos, com os valores sempre passados como parâmetros. A execução usa o motor
+colunar vetorizado e multi-thread do DuckDB, com tempo máximo e limite de linhas.
+"""
+import json
+import logging
+import os
+import threading
+
+import pandas as pd
+
+# Dimensões permitidas: nome na API -> expressão SQL sobre a tabela `embarques`
+DIMENSOES = {
+    'origem': 'origem',
+    'destino': 'destino',
+    'uf_origem': 'uf_origem',
+    'uf_destino': 'uf_destino',
+    'ano': 'ano',
+    'mes': "strftime(mes, '%Y-%m')",
+}
+
+# Métricas agregadas permitidas
+METRICAS = {
+    'embarques': 'SUM(embarques)',
+    'registros': 'COUNT(*)',
+    'rotas': "COUNT(DISTINCT origem || ' > ' || destino)",
+    'meses': 'COUNT(DISTINCT mes)',
+    'media_mensal': 'SUM(embarques) / COUNT(DISTINCT mes)',
+}
+
+OPERADORES = {'=', '!=', '>', '>=', '<', '<=', 'in', 'not in', 'entre'}
+
+LIMITE_PADRAO = 1000
+LIMITE_MAXIMO = 50000
+TIMEOUT_PADRAO = 10.0
+TIMEOUT_MAXIMO = 30.0
+TAMANHO_LOTE = 2048
+THREADS = int(os.environ.get('CONSULTA_THREADS', os.cpu_count() or 1))
+
+logger = logging.getLogger(__name__)
+
+
+def _extrair_uf(regioes):
+    """Extrai a UF ("NOME/UF") de uma série categórica de mesorregiões, sem reprocessar cada linha"""
+    ufs = regioes.cat.categories.str.extract(r'/\s*([A-Za-z]{2})\s*$', expand=False).str.upper()
+    categorias = ufs.dropna().unique()
+    codigos = pd.Categorical(ufs, categories=categorias).codes
+    return pd.Categorical.from_codes(codigos[regioes.cat.codes.to_numpy()], categories=categorias)
+
+
+def criar_conexao(df):
+    """Cria uma conexão DuckDB em memória com a tabela `embarques` (snapshot dos dados)
+
+    O DataFrame é copiado uma vez para o armazenamento colunar do DuckDB, visível a
+    todos os cursores da conexão (um por requisição). Depois da carga, o acesso a
+    arquivos e a alteração de configuração ficam bloqueados.
+    """
+    import duckdb
+
+    # Mesorregiões como categorias: a UF ("NOME/UF") é extraída só dos valores distintos
+    origem = df['MESORREGIÃO - ORIGEM'].astype('category')
+    destino = df['MESORREGIÃO - DESTINO'].astype('category')
+    base = pd.DataFrame({
+        'origem': origem,
+        'destino': destino,
+        'uf_origem': _extrair_uf(origem),
+        'uf_destino': _extrair_uf(destino),
+        'mes': df['DATA'],
+        'ano': df['ANO'],
+        'embarques': df['EMBARQUES']
+    })
+
+    conexao = duckdb.connect(':memory:')
+    conexao.register('dados_carregados', base)
+    conexao.execute('CREATE TABLE embarques AS SELECT origem::VARCHAR AS origem, destino::VARCHAR AS destino, '
+                    'uf_origem::VARCHAR AS uf_origem, uf_destino::VARCHAR AS uf_destino, mes, ano, embarques '
+                    'FROM dados_carregados')
+    conexao.unregister('dados_carregados')
+    conexao.execute(f'SET threads TO {THREADS}')
+    conexao.execute('SET enable_external_access = false')
+    conexao.execute('SET lock_configuration = true')
+    return conexao
+
+
+def _ler_lista(spec, chave, permitidos):
+    """Lê uma lista de nomes da especificação validando contra os permitidos"""
+    valores = spec.get(chave, [])
+    if isinstance(valores, str):
+        valores = [valores]
+    if not isinstance(valores, list) or not all(isinstance(v, str) for v in valores):
+        raise ValueError(f"'{chave}' deve ser uma lista de nomes")
+    invalidos = [v for v in valores if v not in permitidos]
+    if invalidos:
+        raise ValueError(f"Valores não permitidos em '{chave}': {', '.join(invalidos)}")
+    if len(set(valores)) != len(valores):
+        raise ValueError(f"Valores repetidos em '{chave}'")
+    return valores
+
+
+def _montar_condicao(filtro, expressoes):
+    """Monta uma condição parametrizada; retorna (sql, parametros)"""
+    if not isinstance(filtro, dict):
+        raise ValueError('Cada filtro deve ser um objeto {campo, op, valor}')
+    campo, operador, valor = filtro.get('campo'), str(filtro.get('op', '=')).lower(), filtro.get('valor')
+    if campo not in expressoes:
+        raise ValueError(f"Campo de filtro não permitido: {campo}")
+    if operador not in OPERADORES:
+        raise ValueError(f"Operador não permitido: {operador}")
+
+    expressao = expressoes[campo]
+    if operador in ('in', 'not in'):
+        if not isinstance(valor, list) or not valor:
+            raise ValueError(f"'{operador}' exige uma lista não vazia de valores")
+        marcadores = ', '.join('?' * len(valor))
+        return f"{expressao} {operador.upper()} ({marcadores})", list(valor)
+    if operador == 'entre':
+        if not isinstance(valor, list) or len(valor) != 2:
+            raise ValueError("'entre' exige uma lista [minimo, maximo]")
+        return f"{expressao} BETWEEN ? AND ?", list(valor)
+    if isinstance(valor, (list, dict)) or valor is None:
+        raise ValueError(f"'{operador}' exige um único valor")
+    return f"{expressao} {operador} ?", [valor]
+
+
+def montar_consulta(spec):
+    """Valida a especificação e monta (sql, parametros, timeout)
+
+    Filtros sobre dimensões viram WHERE; filtros sobre métricas viram HAVING.
+    `participacao_por` adiciona a participação (%) dos embarques de cada linha dentro
+    dos grupos formados pelas dimensões indicadas (vazio = sobre o total).
+    Lança ValueError com mensagem para o usuário se a especificação for inválida.
+    """
+    if not isinstance(spec, dict):
+        raise ValueError('A consulta deve ser um objeto JSON')
+
+    dimensoes = _ler_lista(spec, 'dimensoes', DIMENSOES)
+    metricas = _ler_lista(spec, 'metricas', METRICAS) or ['embarques']
+
+    selecao = [f"{DIMENSOES[d]} AS {d}" for d in dimensoes] + [f"{METRICAS[m]} AS {m}" for m in metricas]
+    colunas = dimensoes + metricas
+
+    if 'participacao_por' in spec:
+        participacao_por = _ler_lista(spec, 'participacao_por', dimensoes)
+        particao = f"PARTITION BY {', '.join(DIMENSOES[d] for d in participacao_por)}" if participacao_por else ''
+        selecao.append(f"100.0 * SUM(embarques) / SUM(SUM(embarques)) OVER ({particao}) AS participacao")
+        colunas.append('participacao')
+
+    where, having, parametros_where, parametros_having = [], [], [], []
+    filtros = spec.get('filtros', [])
+    if not isinstance(filtros, list):
+        raise ValueError("'filtros' deve ser uma lista")
+    for filtro in filtros:
+        if isinstance(filtro, dict) and filtro.get('campo') in METRICAS:
+            condicao, parametros = _montar_condicao(filtro, METRICAS)
+            having.append(condicao)
+            parametros_having.extend(parametros)
+        else:
+            condicao, parametros = _montar_condicao(filtro, DIMENSOES)
+            where.append(condicao)
+            parametros_where.extend(parametros)
+
+    ordem = []
+    for item in spec.get('ordem', []) or [{'campo': metricas[0], 'direcao': 'desc'}]:
+        if not isinstance(item, dict) or item.get('campo') not in colunas:
+            raise ValueError(f"Ordenação só pode usar colunas da consulta: {', '.join(colunas)}")
+        direcao = str(item.get('direcao', 'asc')).lower()
+        if direcao not in ('asc', 'desc'):
+            raise ValueError("'direcao' deve ser 'asc' ou 'desc'")
+        ordem.append(f"{item['campo']} {direcao.upper()}")
+
+    try:
+        limite = min(max(int(spec.get('limite', LIMITE_PADRAO)), 1), LIMITE_MAXIMO)
+        timeout = min(max(float(spec.get('timeout', TIMEOUT_PADRAO)), 0.1), TIMEOUT_MAXIMO)
+    except (ValueError, TypeError):
+        raise ValueError("'limite' e 'timeout' devem ser numéricos")
+
+    sql = f"SELECT {', '.join(selecao)} FROM embarques"
+    if where:
+        sql += f" WHERE {' AND '.join(where)}"
+    if dimensoes:
+        sql += f" GROUP BY {', '.join(DIMENSOES[d] for d in dimensoes)}"
+    if having:
+        sql += f" HAVING {' AND '.join(having)}"
+    sql += f" ORDER BY {', '.join(ordem)} LIMIT {limite}"
+
+    return sql, parametros_where + parametros_having, timeout
+
+
+def executar(conexao, sql, parametros, timeout):
+    """Executa a consulta em um cursor próprio, interrompendo-a após `timeout` segundos
+
+    Retorna (cursor, timer); o timer continua ativo durante a leitura dos lotes e
+    deve ser cancelado ao final.
+    """
+    cursor = conexao.cursor()
+    timer = threading.Timer(timeout, cursor.interrupt)
+    timer.daemon = True
+    timer.start()
+    try:
+        cursor.execute(sql, parametros)
+    except Exception:
+        timer.cancel()
+        cursor.close()
+        raise
+    return cursor, timer
+
+
+def gerar_json(cursor, timer):
+    """Gera a resposta JSON em lotes: as linhas são escritas à medida que são lidas
+
+    Se a consulta for interrompida no meio da leitura, o JSON continua válido e o
+    campo `erro` indica o motivo.
+    """
+    total = 0
+    erro = None
+    try:
+        colunas = [descricao[0] for descricao in cursor.description]
+        yield '{"colunas": ' + json.dumps(colunas) + ', "linhas": ['
+        while True:
+            try:
+                lote = cursor.fetchmany(TAMANHO_LOTE)
+            except Exception as e:
+                erro = f"Consulta interrompida: {str(e)}"
+                break
+            if not lote:
+                break
+            prefixo = ', ' if total else ''
+            yield prefixo + ', '.join(json.dumps(list(linha), default=str) for linha in lote)
+            total += len(lote)
+        yield '], "total_linhas": ' + json.dumps(total) + ', "erro": ' + json.dumps(erro) + '}'
+    finally:
+        timer.cancel()
+        cursor.close()
+
+
+class _SaidaEmPartes:
+    """Destino de escrita que acumula os bytes até serem drenados (para streaming)"""
+
+    def __init__(self):
+        self.partes = []
+        self.closed = False
+
+    def write(self, dados):
+        self.partes.append(bytes(dados))
+        return len(dados)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drenar(self):
+        dados = b''.join(self.partes)
+        self.partes = []
+        return dados
+
+
+def gerar_arrow(cursor, timer):
+    """Gera a resposta no formato Arrow IPC (stream), enviando cada record batch assim que é lido
+
+    O formato não tem onde levar um erro: se a consulta for interrompida no meio da
+    leitura, a interrupção é registrada no log e o stream é encerrado normalmente com
+    os lotes já enviados.
+    """
+    import pyarrow as pa
+
+    saida = _SaidaEmPartes()
+    try:
+        leitor = cursor.to_arrow_reader(TAMANHO_LOTE)
+        with pa.ipc.new_stream(saida, leitor.schema) as escritor:
+            while True:
+                try:
+                    lote = leitor.read_next_batch()
+                except StopIteration:
+                    break
+                except Exception as e:
+                    logger.warning(f"Consulta interrompida durante o envio em Arrow: {str(e)}")
+                    break
+                escritor.write_batch(lote)
+                yield saida.drenar()
+        yield saida.drenar()
+    finally:
+        timer.cancel()
+        cursor.close()
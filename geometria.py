@@ -0,0 +1,143 @@
+"""Geometria dos fluxos para o mapa: arcos de grande círculo, empacotamento de arestas
+e codificação compacta (polyline) no servidor
+
+As funções operam sobre arrays com todos os fluxos de uma vez (fluxos x pontos x 2,
+coordenadas em [lat, lon]).
+"""
+import numpy as np
+
+# Parâmetros por faixa de zoom: (zoom máximo, pontos por arco, casas decimais, célula do corredor em graus)
+NIVEIS_ZOOM = (
+    (4, 8, 2, 3.0),
+    (6, 16, 3, 1.5),
+    (99, 32, 4, 0.5),
+)
+
+CURVATURA = 0.15  # deslocamento lateral máximo do arco, em fração do comprimento
+FORCA_EMPACOTAMENTO = 0.6  # quanto o meio do arco é puxado para o eixo do corredor
+RAIO_ESPALHAMENTO = 0.35  # graus; separa regiões que caem no mesmo ponto
+
+
+def nivel_zoom(zoom):
+    """Retorna (indice, pontos, casas, celula) da faixa correspondente ao zoom"""
+    for indice, (zoom_max, pontos, casas, celula) in enumerate(NIVEIS_ZOOM):
+        if zoom <= zoom_max:
+            return indice, pontos, casas, celula
+    indice = len(NIVEIS_ZOOM) - 1
+    return (indice,) + NIVEIS_ZOOM[indice][1:]
+
+
+def espalhar_coincidentes(coords, raio=RAIO_ESPALHAMENTO):
+    """Distribui em círculo as regiões que resolvem para a mesma coordenada
+
+    Regiões com coordenada única ficam onde estão; a posição de cada região depende
+    apenas da ordem de entrada, então é estável entre requisições.
+    """
+    coords = np.asarray(coords, dtype=float)
+    _, grupo, contagem = np.unique(coords, axis=0, return_inverse=True, return_counts=True)
+    grupo = grupo.ravel()
+
+    # Posição de cada região dentro do seu grupo
+    ordem = np.argsort(grupo, kind='stable')
+    inicio_grupo = np.searchsorted(grupo[ordem], grupo[ordem])
+    posicao = np.empty(len(grupo), dtype=int)
+    posicao[ordem] = np.arange(len(grupo)) - inicio_grupo
+
+    tamanho = contagem[grupo]
+    angulo = 2 * np.pi * posicao / tamanho
+    deslocamento = np.where(tamanho > 1, raio, 0.0)
+
+    espalhadas = coords.copy()
+    espalhadas[:, 0] += deslocamento * np.sin(angulo)
+    espalhadas[:, 1] += deslocamento * np.cos(angulo) / np.cos(np.radians(coords[:, 0]))
+    return espalhadas
+
+
+def _para_vetores(coords):
+    """Converte [lat, lon] em graus para vetores unitários 3D"""
+    lat, lon = np.radians(coords[..., 0]), np.radians(coords[..., 1])
+    return np.stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)], axis=-1)
+
+
+def _para_coordenadas(vetores):
+    """Converte vetores 3D de volta para [lat, lon] em graus"""
+    x, y, z = vetores[..., 0], vetores[..., 1], vetores[..., 2]
+    return np.stack([np.degrees(np.arctan2(z, np.hypot(x, y))), np.degrees(np.arctan2(y, x))], axis=-1)
+
+
+def arcos(origens, destinos, n_pontos, curvatura=CURVATURA):
+    """Interpola arcos de grande círculo curvados lateralmente
+
+    A curvatura sempre para o mesmo lado do sentido origem→destino, então A→B e B→A
+    não se sobrepõem. Retorna um array fluxos x n_pontos x 2.
+    """
+    origens = np.asarray(origens, dtype=float)
+    destinos = np.asarray(destinos, dtype=float)
+    t = np.linspace(0, 1, n_pontos)[None, :, None]
+
+    p0 = _para_vetores(origens)[:, None, :]
+    p1 = _para_vetores(destinos)[:, None, :]
+    omega = np.arccos(np.clip((p0 * p1).sum(axis=-1, keepdims=True), -1, 1))
+    seno = np.sin(omega)
+
+    # slerp; pontos coincidentes caem na interpolação linear
+    with np.errstate(divide='ignore', invalid='ignore'):
+        esferico = (np.sin((1 - t) * omega) * p0 + np.sin(t * omega) * p1) / seno
+    linear = (1 - t) * p0 + t * p1
+    pontos = _para_coordenadas(np.where(seno > 1e-9, esferico, linear))
+
+    # Deslocamento perpendicular ao segmento, máximo no meio do arco
+    direcao = destinos - origens
+    normal = np.stack([direcao[:, 1], -direcao[:, 0]], axis=-1)[:, None, :]
+    return pontos + curvatura * np.sin(np.pi * t) * normal
+
+
+def empacotar(origens, destinos, pesos, n_pontos, celula, forca=FORCA_EMPACOTAMENTO):
+    """Gera os arcos com empacotamento por corredor
+
+    Fluxos cujas origens e destinos caem nas mesmas células da grade formam um
+    corredor; o meio de cada arco é puxado para o arco médio (ponderado pelo volume)
+    do corredor, enquanto as pontas continuam nas coordenadas de cada região.
+    """
+    origens = np.asarray(origens, dtype=float)
+    destinos = np.asarray(destinos, dtype=float)
+    pesos = np.asarray(pesos, dtype=float)
+
+    celulas = np.floor(np.hstack([origens, destinos]) / celula)
+    _, corredor = np.unique(celulas, axis=0, return_inverse=True)
+    corredor = corredor.ravel()
+
+    soma = np.bincount(corredor, weights=pesos)
+    soma = np.where(soma > 0, soma, 1)
+    media_origem = np.stack([np.bincount(corredor, weights=pesos * origens[:, i]) / soma for i in (0, 1)], axis=-1)
+    media_destino = np.stack([np.bincount(corredor, weights=pesos * destinos[:, i]) / soma for i in (0, 1)], axis=-1)
+
+    proprios = arcos(origens, destinos, n_pontos)
+    eixos = arcos(media_origem, media_destino, n_pontos)[corredor]
+
+    t = np.linspace(0, 1, n_pontos)[None, :, None]
+    peso_eixo = forca * np.sin(np.pi * t)
+    return (1 - peso_eixo) * proprios + peso_eixo * eixos
+
+
+def codificar_polylines(linhas, casas):
+    """Codifica cada linha (pontos x 2) no formato Encoded Polyline
+
+    Usa `casas` decimais em vez das 5 do formato padrão (o cliente recebe a precisão).
+    A quantização, os deltas e a divisão em blocos de 5 bits são vetorizados; só a
+    junção final dos bytes é feita por linha.
+    """
+    n_linhas, n_pontos, _ = linhas.shape
+    inteiros = np.round(linhas * 10 ** casas).astype(np.int64)
+    deltas = np.diff(inteiros, axis=1, prepend=0).reshape(n_linhas, n_pontos * 2)
+
+    valores = np.where(deltas < 0, ~(deltas << 1), deltas << 1)
+    deslocamentos = 5 * np.arange(7)
+    blocos = (valores[..., None] >> deslocamentos) & 0x1f
+    restante = valores[..., None] >> (deslocamentos + 5)
+    validos = (np.arange(7) == 0) | ((valores[..., None] >> deslocamentos) > 0)
+
+    caracteres = (blocos | np.where(restante > 0, 0x20, 0)) + 63
+    caracteres = caracteres.astype(np.uint8).reshape(n_linhas, -1)
+    validos = validos.reshape(n_linhas, -1)
+    return [caracteres[i][validos[i]].tobytes().decode('ascii') for i in range(n_linhas)]
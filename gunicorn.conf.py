@@ -0,0 +1,21 @@
+"""Configuração do gunicorn (lida automaticamente a partir do diretório do projeto)
+
+Com `preload_app`, o app (imports de pandas/NumPy e os DADOS_INICIAIS, se houver) é
+carregado uma única vez no processo mestre; os workers são criados por fork e
+compartilham essa memória via copy-on-write.
+"""
+import gc
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+preload_app = True
+
+# `workers` fica no padrão do gunicorn (WEB_CONCURRENCY ou 1): os dados enviados por
+# /api/upload ficam só na memória do worker que recebeu o upload. Mais de um worker
+# só é consistente quando a base vem de DADOS_INICIAIS, pré-carregada no mestre.
+
+
+def pre_fork(server, worker):
+    # Move os objetos já carregados para a geração permanente do GC: as coletas nos
+    # workers não tocam essas páginas, preservando o compartilhamento copy-on-write
+    gc.freeze()
@@ -0,0 +1,128 @@
+"""Previsão de demanda em lote para séries mensais de embarques
+
+Cada linha da matriz de entrada é uma série (total, origem, destino ou rota) e
+todas as séries são ajustadas juntas: os laços são apenas sobre o tempo e sobre a
+grade de parâmetros, nunca sobre as séries.
+"""
+import numpy as np
+
+# Grade de parâmetros do Holt-Winters (avaliada para todas as séries de uma vez)
+ALPHAS = (0.1, 0.3, 0.5, 0.8)
+BETAS = (0.01, 0.1, 0.3)
+GAMMAS = (0.05, 0.2, 0.5)
+PHI = 0.9  # amortecimento da tendência
+
+# Quantil da normal para o intervalo de 95%
+Z_INTERVALO = 1.96
+
+
+def prever_media(valores, horizonte, janela=3):
+    """Projeta a média dos últimos meses (séries curtas, sem sazonalidade)"""
+    ultimos = valores[:, -janela:]
+    nivel = ultimos.mean(axis=1)
+    residuos = ultimos - nivel[:, None]
+    sigma = np.sqrt((residuos ** 2).mean(axis=1))
+    previsao = np.repeat(nivel[:, None], horizonte, axis=1)
+    return previsao, sigma, 'media'
+
+
+def prever_sazonal_ingenuo(valores, horizonte, periodo=12):
+    """Repete o mesmo mês do ano anterior (seasonal naive)"""
+    n_meses = valores.shape[1]
+    indices = n_meses - periodo + (np.arange(horizonte) % periodo)
+    previsao = valores[:, indices]
+    residuos = valores[:, periodo:] - valores[:, :-periodo]
+    sigma = np.sqrt((residuos ** 2).mean(axis=1))
+    return previsao, sigma, 'sazonal_ingenuo'
+
+
+def prever_holt_winters(valores, horizonte, periodo=12):
+    """Holt-Winters aditivo com tendência amortecida
+
+    Todas as combinações da grade são simuladas em paralelo (séries x combinações)
+    e cada série fica com a combinação de menor erro quadrático um passo à frente.
+    """
+    grade = np.array([(a, b, g) for a in ALPHAS for b in BETAS for g in GAMMAS])
+    alpha, beta, gamma = grade[:, 0], grade[:, 1], grade[:, 2]
+    n_series, n_meses = valores.shape
+    n_combinacoes = len(grade)
+
+    # Inicialização pelas duas primeiras temporadas
+    primeira = valores[:, :periodo]
+    segunda = valores[:, periodo:2 * periodo]
+    nivel = np.repeat(primeira.mean(axis=1)[:, None], n_combinacoes, axis=1)
+    tendencia = np.repeat(((segunda.mean(axis=1) - primeira.mean(axis=1)) / periodo)[:, None], n_combinacoes, axis=1)
+    sazonalidade = np.repeat((primeira - primeira.mean(axis=1, keepdims=True))[:, :, None], n_combinacoes, axis=2)
+
+    sse = np.zeros((n_series, n_combinacoes))
+    for t in range(n_meses):
+        y = valores[:, t][:, None]
+        s = sazonalidade[:, t % periodo, :]
+        erro = y - (nivel + PHI * tendencia + s)
+        if t >= periodo:
+            sse += erro ** 2
+
+        novo_nivel = alpha * (y - s) + (1 - alpha) * (nivel + PHI * tendencia)
+        tendencia = beta * (novo_nivel - nivel) + (1 - beta) * PHI * tendencia
+        sazonalidade[:, t % periodo, :] = gamma * (y - novo_nivel) + (1 - gamma) * s
+        nivel = novo_nivel
+
+    melhor = sse.argmin(axis=1)
+    linhas = np.arange(n_series)
+    nivel = nivel[linhas, melhor]
+    tendencia = tendencia[linhas, melhor]
+    sazonalidade = sazonalidade[linhas, :, melhor]
+    sigma = np.sqrt(sse[linhas, melhor] / (n_meses - periodo))
+
+    passos = np.arange(1, horizonte + 1)
+    amortecimento = np.cumsum(PHI ** passos)
+    indices = (n_meses + passos - 1) % periodo
+    previsao = nivel[:, None] + amortecimento[None, :] * tendencia[:, None] + sazonalidade[:, indices]
+    return previsao, sigma, 'holt_winters'
+
+
+def ajustar_lote(valores, horizonte, periodo=12):
+    """Ajusta um lote de séries e devolve previsões com intervalo de 95%
+
+    O modelo depende do tamanho do histórico (comum a todas as séries do lote):
+    Holt-Winters com duas temporadas ou mais, sazonal ingênuo com uma temporada e
+    ao menos um mês a mais (para haver resíduo ano contra ano), média móvel abaixo
+    disso. Função de módulo para poder ser enviada a um processo.
+    """
+    valores = np.asarray(valores, dtype=float)
+    n_meses = valores.shape[1]
+
+    if n_meses >= 2 * periodo:
+        previsao, sigma, modelo = prever_holt_winters(valores, horizonte, periodo)
+    elif n_meses > periodo:
+        previsao, sigma, modelo = prever_sazonal_ingenuo(valores, horizonte, periodo)
+    else:
+        previsao, sigma, modelo = prever_media(valores, horizonte)
+
+    # Sem resíduo para estimar a dispersão, o intervalo colapsa na previsão (nunca NaN)
+    sigma = np.where(np.isfinite(sigma), sigma, 0.0)
+
+    # Incerteza cresce com a raiz do horizonte; embarques não ficam negativos
+    margem = Z_INTERVALO * sigma[:, None] * np.sqrt(np.arange(1, horizonte + 1))[None, :]
+    return {
+        'previsao': np.maximum(previsao, 0),
+        'inferior': np.maximum(previsao - margem, 0),
+        'superior': np.maximum(previsao + margem, 0),
+        'modelo': modelo
+    }
+
+
+def ajustar_em_paralelo(valores, horizonte, executor, n_lotes):
+    """Divide as séries em lotes e envia cada lote ao executor (pool de processos)"""
+    lotes = np.array_split(np.asarray(valores, dtype=float), max(1, n_lotes))
+    return [executor.submit(ajustar_lote, lote, horizonte) for lote in lotes if len(lote)]
+
+
+def juntar_resultados(resultados):
+    """Concatena os resultados dos lotes na ordem original das séries"""
+    return {
+        'previsao': np.concatenate([r['previsao'] for r in resultados]),
+        'inferior': np.concatenate([r['inferior'] for r in resultados]),
+        'superior': np.concatenate([r['superior'] for r in resultados]),
+        'modelo': resultados[0]['modelo']
+    }
@@ -0,0 +1,48 @@
+"""Testes dos z-scores robustos das rotas (anomalias.py)"""
+import numpy as np
+
+import anomalias
+
+
+def test_zscores_moveis_sem_historico_sao_nan():
+    z, esperado = anomalias.zscores_moveis(np.ones((2, 6)), janela=6)
+
+    assert np.isnan(z).all()
+    assert np.isnan(esperado).all()
+
+
+def test_zscore_movel_usa_mediana_e_mad_da_janela():
+    valores = np.array([[10, 12, 8, 11, 9, 10, 30]], dtype=float)
+
+    z, esperado = anomalias.zscores_moveis(valores, janela=6)
+
+    # mediana 10, MAD 1 -> escala max(1.4826, sqrt(10))
+    assert esperado[0, 6] == 10
+    np.testing.assert_allclose(z[0, 6], 20 / np.sqrt(10))
+
+
+def test_piso_escala_segue_o_volume_da_rota():
+    np.testing.assert_allclose(anomalias.piso_escala(np.array([0, 0.25, 100, 10000])), [1, 1, 10, 100])
+
+
+def test_rota_esparsa_nao_supera_queda_em_rota_grande():
+    rng = np.random.default_rng(0)
+    esparsa = np.zeros(24)
+    esparsa[-1] = 8
+    grande = rng.normal(10000, 150, 24)
+    grande[-1] = 6000
+
+    scores = anomalias.calcular_scores(np.vstack([esparsa, grande]))['score'][:, -1]
+
+    assert abs(scores[1]) > abs(scores[0])
+
+
+def test_pico_sazonal_nao_e_anomalia():
+    ano = np.array([100, 100, 100, 100, 100, 100, 100, 100, 100, 100, 100, 300], dtype=float)
+    valores = np.tile(ano, 3)[None, :]
+
+    scores = anomalias.calcular_scores(valores)
+
+    # Dezembro destoa da janela móvel, mas repete o ano anterior
+    assert abs(scores['z_movel'][0, -1]) > 3
+    assert abs(scores['score'][0, -1]) < 1
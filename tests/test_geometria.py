@@ -0,0 +1,54 @@
+"""Testes da geometria do mapa de fluxos (geometria.py)"""
+import numpy as np
+import pytest
+
+import geometria
+
+
+def decodificar_polyline(texto, casas):
+    """Decodificador de referência do formato Encoded Polyline (algoritmo publicado)"""
+    pontos, coordenadas, indice = [], [0, 0], 0
+    while indice < len(texto):
+        for eixo in range(2):
+            resultado, deslocamento = 0, 0
+            while True:
+                byte = ord(texto[indice]) - 63
+                indice += 1
+                resultado |= (byte & 0x1f) << deslocamento
+                deslocamento += 5
+                if byte < 0x20:
+                    break
+            coordenadas[eixo] += ~(resultado >> 1) if resultado & 1 else resultado >> 1
+        pontos.append((coordenadas[0] / 10 ** casas, coordenadas[1] / 10 ** casas))
+    return pontos
+
+
+def test_codificar_polylines_exemplo_do_formato():
+    linha = np.array([[[38.5, -120.2], [40.7, -120.95], [43.252, -126.453]]])
+
+    assert geometria.codificar_polylines(linha, 5) == ['_p~iF~ps|U_ulLnnqC_mqNvxq`@']
+
+
+@pytest.mark.parametrize('casas', [3, 4, 5, 6])
+def test_codificar_polylines_ida_e_volta(casas):
+    rng = np.random.default_rng(casas)
+    linhas = np.column_stack([rng.uniform(-34, 6, 40), rng.uniform(-74, -34, 40)]).reshape(4, 10, 2)
+    linhas[0, 3] = linhas[0, 2]  # delta zero
+    linhas[1, 0] = (0.0, 0.0)
+
+    codificadas = geometria.codificar_polylines(linhas, casas)
+
+    assert len(codificadas) == 4
+    for texto, linha in zip(codificadas, linhas):
+        np.testing.assert_allclose(decodificar_polyline(texto, casas), np.round(linha, casas), atol=10 ** -casas / 2)
+
+
+def test_arcos_ligam_origem_ao_destino():
+    origens = np.array([[-23.5, -46.6], [-15.8, -47.9]])
+    destinos = np.array([[-22.9, -43.2], [-3.1, -60.0]])
+
+    linhas = geometria.arcos(origens, destinos, 9)
+
+    assert linhas.shape == (2, 9, 2)
+    np.testing.assert_allclose(linhas[:, 0], origens)
+    np.testing.assert_allclose(linhas[:, -1], destinos)
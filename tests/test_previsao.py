@@ -0,0 +1,72 @@
+"""Testes do ajuste em lote de previsões (previsao.py)"""
+import numpy as np
+import pytest
+
+import previsao
+
+
+def serie_sazonal(n_meses, nivel=100.0, amplitude=10.0, inclinacao=0.5):
+    t = np.arange(n_meses)
+    return nivel + amplitude * np.sin(2 * np.pi * t / 12) + inclinacao * t
+
+
+@pytest.mark.parametrize('n_meses, modelo', [
+    (1, 'media'),
+    (11, 'media'),
+    (12, 'media'),
+    (13, 'sazonal_ingenuo'),
+    (23, 'sazonal_ingenuo'),
+    (24, 'holt_winters'),
+    (36, 'holt_winters'),
+])
+def test_ajustar_lote_limites_de_historico(n_meses, modelo):
+    rng = np.random.default_rng(n_meses)
+    valores = np.vstack([
+        serie_sazonal(n_meses),
+        rng.poisson(30, n_meses),
+        np.zeros(n_meses),
+    ])
+    horizonte = 12
+
+    resultado = previsao.ajustar_lote(valores, horizonte)
+
+    assert resultado['modelo'] == modelo
+    for chave in ('previsao', 'inferior', 'superior'):
+        assert resultado[chave].shape == (3, horizonte)
+        assert np.isfinite(resultado[chave]).all()
+        assert (resultado[chave] >= 0).all()
+    assert (resultado['inferior'] <= resultado['previsao']).all()
+    assert (resultado['previsao'] <= resultado['superior']).all()
+
+
+def test_sazonal_ingenuo_repete_o_ano_anterior():
+    valores = np.arange(1, 14, dtype=float)[None, :]
+
+    resultado = previsao.ajustar_lote(valores, 3)
+
+    np.testing.assert_array_equal(resultado['previsao'], [[2, 3, 4]])
+
+
+def test_holt_winters_acompanha_sazonalidade():
+    valores = serie_sazonal(48)[None, :]
+    esperado = serie_sazonal(60)[48:]
+
+    resultado = previsao.ajustar_lote(valores, 12)
+
+    assert np.abs(resultado['previsao'][0] - esperado).max() < 10
+
+
+def test_serie_constante_tem_intervalo_nulo():
+    resultado = previsao.ajustar_lote(np.full((1, 24), 50.0), 6)
+
+    np.testing.assert_allclose(resultado['previsao'], 50)
+    np.testing.assert_allclose(resultado['inferior'], resultado['superior'])
+
+
+def test_juntar_resultados_preserva_a_ordem():
+    valores = np.arange(5 * 13, dtype=float).reshape(5, 13)
+    lotes = np.array_split(valores, 2)
+
+    juntos = previsao.juntar_resultados([previsao.ajustar_lote(lote, 4) for lote in lotes])
+
+    np.testing.assert_array_equal(juntos['previsao'], previsao.ajustar_lote(valores, 4)['previsao'])